@@ -1,24 +1,74 @@
+import threading
+from functools import lru_cache
+from typing import Optional
+
 import boto3
+from botocore.config import Config
 from . import storage  # keep import order for packaging
 from ..core.config import settings
 
+# Each cached client is shared by every request thread (FastAPI's threadpool
+# runs up to 40), storage's background pools (8 I/O + 32 listing workers)
+# and multipart transfer threads, so its connection pool must be larger
+# than botocore's default 10 or connections get discarded and re-opened
+# under load.
+MAX_POOL_CONNECTIONS = 96
+_CLIENT_CONFIG = Config(max_pool_connections=MAX_POOL_CONNECTIONS)
+
+# boto3's default session isn't thread-safe, so clients are built from a
+# dedicated session and only one at a time.
+_session = boto3.session.Session()
+_session_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _s3_client(region: str, endpoint_url: Optional[str], access_key: str, secret_key: str):
+    with _session_lock:
+        return _session.client(
+            "s3",
+            region_name=region,
+            endpoint_url=endpoint_url,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            config=_CLIENT_CONFIG,
+        )
+
+
+@lru_cache(maxsize=None)
+def _dynamodb_client(region: str, endpoint_url: Optional[str], access_key: str, secret_key: str):
+    with _session_lock:
+        return _session.client(
+            "dynamodb",
+            region_name=region,
+            endpoint_url=endpoint_url,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            config=_CLIENT_CONFIG,
+        )
+
+
 def s3():
-    """Create an S3 client using our configured region/endpoint/creds.'.
+    """Return the S3 client for our configured region/endpoint/creds.
+
+    Clients are cached per configuration, so repeated calls reuse the same
+    client instead of rebuilding botocore's service model each request.
     """
-    return boto3.client(
-        "s3",
-        region_name=settings.aws_region,
-        endpoint_url=settings.aws_endpoint_url,
-        aws_access_key_id=settings.aws_access_key_id,
-        aws_secret_access_key=settings.aws_secret_access_key,
+    return _s3_client(
+        settings.aws_region,
+        settings.aws_endpoint_url,
+        settings.aws_access_key_id,
+        settings.aws_secret_access_key,
     )
 
-def dynamodb_table():
-    """Return a DynamoDB Table handle for the configured table name."""
-    return boto3.resource(
-        "dynamodb",
-        region_name=settings.aws_region,
-        endpoint_url=settings.aws_endpoint_url,
-        aws_access_key_id=settings.aws_access_key_id,
-        aws_secret_access_key=settings.aws_secret_access_key,
-    ).Table(settings.table_name)
+def dynamodb():
+    """Return the (cached) low-level DynamoDB client.
+
+    Unlike the Table resource this works on raw AttributeValue maps, so hot
+    paths can skip boto3's per-call type conversion.
+    """
+    return _dynamodb_client(
+        settings.aws_region,
+        settings.aws_endpoint_url,
+        settings.aws_access_key_id,
+        settings.aws_secret_access_key,
+    )
@@ -1,27 +1,133 @@
-from typing import Optional, List, Dict, Any
-import base64
+from typing import Optional, List, Dict, Any, Tuple, BinaryIO, Union, Callable
+import binascii
+import heapq
 import time
-import uuid
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import secrets
+import threading
+from collections import OrderedDict
 from io import BytesIO
-from boto3.dynamodb.conditions import Key, Attr
-from PIL import Image, ExifTags
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from boto3.s3.transfer import TransferConfig
+from PIL import Image, ExifTags, ImageFile
 from ..core.config import settings
-from .clients import s3 as s3_client_factory, dynamodb_table as dynamodb_table_factory
+from .clients import s3 as s3_client_factory, dynamodb as dynamodb_client_factory
 
-"""Storage helpers for putting, listing, signing and deleting images.
-"""
+try:  # optional SIMD decoder; stdlib binascii is the fallback
+    import pybase64
 
+    def _b64decode(data: str) -> bytes:
+        return pybase64.b64decode(data, validate=False)
+except ImportError:  # pragma: no cover - depends on the environment
+    _b64decode = binascii.a2b_base64
 
-def _extract_image_metadata(data_bytes: bytes) -> Dict[str, Any]:
-    """Open the image and extract a small, useful set of metadata.
+"""Storage helpers for putting, listing, signing and deleting images.
+"""
 
-    Returns a dict containing width/height, format, and selected tags
-    when available. Fails soft by returning an empty dict if parsing fails.
+# Only these Pillow plugins are tried when sniffing uploads, and truncated
+# files are rejected rather than padded during (lazy) decoding.
+SUPPORTED_IMAGE_FORMATS = ("JPEG", "PNG")
+ImageFile.LOAD_TRUNCATED_IMAGES = False
+
+# Leading bytes of the supported formats, checked before Pillow is involved
+_IMAGE_SIGNATURES = (b"\xff\xd8\xff", b"\x89PNG\r\n\x1a\n")
+
+# presigned_get results, (image_id, download) -> (monotonic expiry, result),
+# kept in LRU order. Entries expire this many seconds before their URL does.
+_PRESIGN_CACHE_SIZE = 10_000
+_PRESIGN_CACHE_MARGIN = 60
+_presign_cache: "OrderedDict[Tuple[str, bool], Tuple[float, dict]]" = OrderedDict()
+_presign_lock = threading.Lock()
+# image_id -> generation of its last invalidation, so a cache miss that raced
+# a _forget_presigned doesn't store a stale URL. Generations come from one
+# counter and the map is bounded like the cache; ids dropped from it are
+# treated as invalidated at _presign_pruned_generation (the newest dropped).
+_presign_generation = 0
+_presign_pruned_generation = 0
+_presign_invalidated: "OrderedDict[str, int]" = OrderedDict()
+
+# Byte ranges tried (in order) when reading an object's header for metadata
+_HEADER_RANGE_ENDS = (64 * 1024 - 1, 512 * 1024 - 1)
+
+# Shared pool for overlapping short S3/DynamoDB writes within a request.
+# Long-running transfers must not be submitted here.
+_io_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="storage-io")
+
+# Number of `list_shard` partitions in the `by_shard_created` index, which
+# lets listings without a user filter query by `created_at` instead of
+# scanning the table. Writes are spread across the shards to avoid a single
+# hot partition. scripts/deploy_localstack.ps1 creates the index and backfills
+# `list_shard` on older records; keep its shard count in sync with this.
+LISTING_SHARD_COUNT = 4
+
+
+# Listing queries get their own pool (follow-on page prefetch and parallel
+# first pages) so listings and uploads never queue behind each other. An
+# unfiltered listing keeps up to one request per shard in flight, so the
+# pool is sized for this many concurrent listings.
+_LISTING_CONCURRENCY = 8
+_listing_pool = ThreadPoolExecutor(
+    max_workers=LISTING_SHARD_COUNT * _LISTING_CONCURRENCY, thread_name_prefix="storage-list"
+)
+
+
+def _listing_shard(image_id: str) -> str:
+    """Return the `list_shard` partition an image record is written to."""
+    return str(zlib.crc32(image_id.encode()) % LISTING_SHARD_COUNT)
+
+# EXIF tag id -> name for the handful of tags we keep in auto metadata.
+# Pillow's ExifTags.TAGS calls 0xA002/0xA003 ExifImageWidth/Height.
+_WANTED_EXIF_TAGS = {
+    0x010F: "Make",
+    0x0110: "Model",
+    0x0131: "Software",
+    0x9003: "DateTimeOriginal",
+    0x0112: "Orientation",
+    0xA002: "PixelXDimension",
+    0xA003: "PixelYDimension",
+}
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+# Objects above the threshold are uploaded as concurrent multipart parts.
+# Every part holds one of the shared S3 client's pooled connections, so a
+# single upload is kept to a small share of clients.MAX_POOL_CONNECTIONS.
+_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=4,
+    use_threads=True,
+)
+
+
+def _extract_image_metadata(
+    data: Union[bytes, BinaryIO]
+) -> Tuple[Dict[str, Any], Optional[str]]:
+    """Open the image once and extract a small, useful set of metadata.
+
+    Returns a ``(meta, fmt)`` tuple: ``meta`` contains width/height, format,
+    and selected tags when available, and ``fmt`` is Pillow's format name so
+    callers can validate the type without parsing the bytes again. Fails soft
+    by returning ``({}, None)`` if parsing fails or the image has more than
+    `settings.max_image_pixels` pixels (a likely decompression bomb).
+
+    Only header attributes and EXIF are read; pixel data is never loaded.
+    (Pillow's PNG `getexif()` decodes the whole image to find an eXIf chunk
+    stored after the pixel data, so PNG EXIF is only read when the chunk
+    was already seen in the header.) `data` may be raw bytes or a seekable
+    binary file, which is read from its current position.
     """
     meta: Dict[str, Any] = {}
+    fp = BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
     try:
-        with Image.open(BytesIO(data_bytes)) as img:
+        with Image.open(fp, formats=SUPPORTED_IMAGE_FORMATS) as img:
+            fmt = img.format
             width, height = img.size
+            # Checked against the header before any pixel data is touched
+            if width * height > settings.max_image_pixels:
+                return {}, None
             meta.update(
                 {
                     "width": width,
@@ -32,106 +138,218 @@ def _extract_image_metadata(data_bytes: bytes) -> Dict[str, Any]:
                 }
             )
 
-            # Map tag ids to names
+            # Look up only the wanted tags; base-IFD tags first, then the
+            # Exif sub-IFD where DateTimeOriginal/PixelXDimension live
             exif_data = {}
             try:
-                raw = getattr(img, "_getexif", lambda: None)()  # type: ignore[attr-defined]
-                if raw:
-                    tag_map = {ExifTags.TAGS.get(k, str(k)): v for k, v in raw.items()}
-                    for key in [
-                        "Make",
-                        "Model",
-                        "Software",
-                        "DateTimeOriginal",
-                        "Orientation",
-                        "PixelXDimension",
-                        "PixelYDimension",
-                    ]:
-                        if key in tag_map:
-                            exif_data[key] = tag_map[key]
+                header_only = fmt != "PNG" or "exif" in img.info
+                exif = img.getexif() if header_only else None
+                if exif:
+                    sub_ifd = exif.get_ifd(ExifTags.IFD.Exif)
+                    for tag_id, name in _WANTED_EXIF_TAGS.items():
+                        value = exif.get(tag_id, sub_ifd.get(tag_id))
+                        if value is not None:
+                            exif_data[name] = value
             except Exception:
                 pass
 
             if exif_data:
                 meta["exif"] = exif_data
     except Exception:
-       
-        return {}
+        return {}, None
 
-    return meta
+    return meta, fmt
 
 
 
-def _store_image(
+def _image_item(
     *,
-    data_bytes: bytes,
+    image_id: str,
     user_id: str,
+    created_at: int,
     filename: str,
     content_type: str,
+    size: int,
+    bucket: str,
+    object_key: str,
+    auto_meta: Optional[Dict[str, Any]] = None,
     metadata: Optional[dict] = None,
     title: Optional[str] = None,
     description: Optional[str] = None,
-    tags: Optional[List[str]] = None
-) -> dict:
-    # Validate the file type
-    try:
-        with Image.open(BytesIO(data_bytes)) as img:
-            fmt = (img.format or '').upper()
-            if fmt not in {"JPEG", "PNG"}:
-                raise ValueError("unsupported_image_type")
-    except Exception:
-        raise ValueError("unsupported_image_type")
-    if not user_id or not filename or not content_type or data_bytes is None:
-        raise ValueError("missing_required_fields")
-
-    image_id = uuid.uuid4().hex
-    created_at = int(time.time())
-    object_key = f"{user_id}/{image_id}/{filename}"
-
-    s3 = s3_client_factory()
-    table = dynamodb_table_factory()
-
-    # Upload object to S3 
-    s3.put_object(
-        Bucket=settings.bucket_name,
-        Key=object_key,
-        Body=data_bytes,
-        ContentType=content_type,
-        Metadata={},
-    )
+    tags: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """Build an image record directly in DynamoDB AttributeValue form.
 
+    The schema's fixed scalar fields are written out literally; only the
+    free-form values (tags and metadata maps) go through TypeSerializer.
+    """
     item: Dict[str, Any] = {
-        "image_id": image_id,
-        "user_id": user_id,
-        "created_at": created_at,
-        "filename": filename,
-        "content_type": content_type,
-        "size": len(data_bytes),
-        "bucket_name": settings.bucket_name,
-        "object_key": object_key,
+        "image_id": {"S": image_id},
+        "user_id": {"S": user_id},
+        "created_at": {"N": str(created_at)},
+        "filename": {"S": filename},
+        "content_type": {"S": content_type},
+        "size": {"N": str(size)},
+        "bucket_name": {"S": bucket},
+        "object_key": {"S": object_key},
+        "list_shard": {"S": _listing_shard(image_id)},
     }
     if title is not None:
-        item["title"] = title
+        item["title"] = {"S": title}
     if description is not None:
-        item["description"] = description
+        item["description"] = {"S": description}
     if tags is not None:
-        item["tags"] = tags
-
-    # Auto-extract image metadata;
-    auto_meta = _extract_image_metadata(data_bytes)
+        item["tags"] = _serializer.serialize(tags)
     if auto_meta:
-        item["auto_metadata"] = auto_meta
+        item["auto_metadata"] = _serializer.serialize(auto_meta)
     if metadata is not None:
-        item["user_metadata"] = metadata
+        item["user_metadata"] = _serializer.serialize(metadata)
+    return item
 
-    table.put_item(Item=item)
 
-    url = s3.generate_presigned_url(
+def _listing_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Deserialize a listed record, leaving out index-only `list_shard`."""
+    return {k: _deserializer.deserialize(v) for k, v in item.items() if k != "list_shard"}
+
+
+def _get_record(ddb, table_name: str, image_id: str) -> Dict[str, Optional[str]]:
+    """Fetch the S3 location and file fields of an image record.
+
+    Returns a dict with keys: bucket, key, filename, content_type (may be
+    None). Raises KeyError("not_found") if there is no such record.
+    """
+    resp = ddb.get_item(TableName=table_name, Key={"image_id": {"S": image_id}})
+    item = resp.get("Item")
+    if not item:
+        raise KeyError("not_found")
+
+    # Read the few string fields we need straight from the AttributeValues
+    return {
+        "bucket": item["bucket_name"]["S"],
+        "key": item["object_key"]["S"],
+        "filename": item.get("filename", {}).get("S", "file"),
+        "content_type": item.get("content_type", {}).get("S"),
+    }
+
+
+def _presign_get_object(
+    s3, bucket: str, key: str, expires_in: int, content_disposition: Optional[str] = None
+) -> str:
+    """Sign a GetObject URL with the (cached) client's request signer.
+
+    Signing is local CPU work only; because the client is cached, its signer
+    and endpoint resolver are reused rather than rebuilt for each URL.
+    """
+    params: Dict[str, Any] = {"Bucket": bucket, "Key": key}
+    if content_disposition is not None:
+        params["ResponseContentDisposition"] = content_disposition
+    return s3.generate_presigned_url(
         ClientMethod="get_object",
-        Params={"Bucket": settings.bucket_name, "Key": object_key},
-        ExpiresIn=int(settings.url_expiry),
+        Params=params,
+        ExpiresIn=expires_in,
     )
 
+
+def _store_image(
+    *,
+    fileobj: BinaryIO,
+    user_id: str,
+    filename: str,
+    content_type: str,
+    metadata: Optional[dict] = None,
+    title: Optional[str] = None,
+    description: Optional[str] = None,
+    tags: Optional[List[str]] = None,
+    clock: Callable[[], float] = time.time,
+) -> dict:
+    """Validate an upload, then write its S3 object and DynamoDB record.
+
+    The two writes overlap, so the record can be listed briefly before the
+    object exists; `get_image_stream` reports such an image as not found.
+    A failure of either write rolls both back.
+    """
+    if not user_id or not filename or not content_type or fileobj is None:
+        raise ValueError("missing_required_fields")
+
+    # Read settings once; they are looked up repeatedly below
+    bucket = settings.bucket_name
+    table_name = settings.table_name
+    url_expiry = int(settings.url_expiry)
+    max_upload_bytes = settings.max_upload_bytes
+
+    # Cheap gates first: size and magic bytes reject bad input before Pillow
+    size = fileobj.seek(0, 2)
+    if size > max_upload_bytes:
+        raise ValueError("file_too_large")
+    fileobj.seek(0)
+    if not fileobj.read(8).startswith(_IMAGE_SIGNATURES):
+        raise ValueError("unsupported_image_type")
+
+    # Validate the file type; the same parse yields the auto metadata below
+    fileobj.seek(0)
+    auto_meta, fmt = _extract_image_metadata(fileobj)
+    if fmt not in SUPPORTED_IMAGE_FORMATS:
+        raise ValueError("unsupported_image_type")
+    fileobj.seek(0)
+
+    image_id = secrets.token_hex(16)
+    created_at = int(clock())
+    object_key = f"{user_id}/{image_id}/{filename}"
+
+    s3 = s3_client_factory()
+    ddb = dynamodb_client_factory()
+
+    item = _image_item(
+        image_id=image_id,
+        user_id=user_id,
+        created_at=created_at,
+        filename=filename,
+        content_type=content_type,
+        size=size,
+        bucket=bucket,
+        object_key=object_key,
+        auto_meta=auto_meta,
+        metadata=metadata,
+        title=title,
+        description=description,
+        tags=tags,
+    )
+
+    # The S3 upload and the DynamoDB write are independent, so overlap them.
+    # Only the short put_item goes to the shared pool; the upload (which may
+    # be a long multipart transfer with its own part threads) stays on the
+    # calling thread so large uploads can't starve listing queries.
+    record = _io_pool.submit(
+        ddb.put_item, TableName=table_name, Item=item
+    )
+
+    try:
+        # Presigning needs no network, so do it before the upload blocks
+        url = _presign_get_object(s3, bucket, object_key, url_expiry)
+        s3.upload_fileobj(
+            fileobj,
+            bucket,
+            object_key,
+            ExtraArgs={"ContentType": content_type},
+            Config=_TRANSFER_CONFIG,
+        )
+        record.result()
+    except Exception:
+        # Best-effort rollback so we don't leave half an image behind
+        wait([record])
+        try:
+            s3.delete_object(Bucket=bucket, Key=object_key)
+        except Exception:
+            pass
+        if record.exception() is None:
+            try:
+                ddb.delete_item(TableName=table_name, Key={"image_id": {"S": image_id}})
+            except Exception:
+                pass
+        # The record may have been visible (and presigned) in the meantime
+        _forget_presigned(image_id)
+        raise
+
     return {"image_id": image_id, "url": url}
 
 
@@ -144,15 +362,16 @@ def put_image(
     title: Optional[str] = None,
     description: Optional[str] = None,
     tags: Optional[List[str]] = None,
+    clock: Callable[[], float] = time.time,
 ) -> dict:
     if not user_id or not filename or not content_type or not data_base64:
         raise ValueError("missing_required_fields")
     try:
-        data_bytes = base64.b64decode(data_base64)
+        data_bytes = _b64decode(data_base64)
     except Exception:
         raise ValueError("invalid_base64")
     return _store_image(
-        data_bytes=data_bytes,
+        fileobj=BytesIO(data_bytes),
         user_id=user_id,
         filename=filename,
         content_type=content_type,
@@ -160,6 +379,7 @@ def put_image(
         title=title,
         description=description,
         tags=tags,
+        clock=clock,
     )
 
 
@@ -173,9 +393,36 @@ def put_image_bytes(
     title: Optional[str] = None,
     description: Optional[str] = None,
     tags: Optional[List[str]] = None,
+    clock: Callable[[], float] = time.time,
+) -> dict:
+    return _store_image(
+        fileobj=BytesIO(data_bytes),
+        user_id=user_id,
+        filename=filename,
+        content_type=content_type,
+        metadata=metadata,
+        title=title,
+        description=description,
+        tags=tags,
+        clock=clock,
+    )
+
+def put_image_fileobj(
+    *,
+    user_id: str,
+    filename: str,
+    content_type: str,
+    fileobj: BinaryIO,
+    metadata: Optional[dict] = None,
+    title: Optional[str] = None,
+    description: Optional[str] = None,
+    tags: Optional[List[str]] = None,
+    clock: Callable[[], float] = time.time,
 ) -> dict:
+    """Store an image read from a seekable binary file (e.g. an upload's
+    spooled temp file) without first materializing it as bytes."""
     return _store_image(
-        data_bytes=data_bytes,
+        fileobj=fileobj,
         user_id=user_id,
         filename=filename,
         content_type=content_type,
@@ -183,8 +430,38 @@ def put_image_bytes(
         title=title,
         description=description,
         tags=tags,
+        clock=clock,
     )
 
+def _run_queries(ddb, queries: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Run DynamoDB queries to completion concurrently, returning each one's items.
+
+    The first query's first page is fetched on the calling thread and the
+    other queries' first pages on the listing pool. After that each query
+    keeps one page request in flight: the next page is requested as soon as
+    `LastEvaluatedKey` is known, so round trips overlap with deserializing
+    the pages already received.
+    """
+    results: List[List[Dict[str, Any]]] = [[] for _ in queries]
+    pending: Dict[Any, int] = {}
+
+    def _consume(i: int, page: Dict[str, Any]) -> None:
+        last_key = page.get("LastEvaluatedKey")
+        if last_key:
+            future = _listing_pool.submit(ddb.query, **queries[i], ExclusiveStartKey=last_key)
+            pending[future] = i
+        results[i].extend(_listing_item(item) for item in page.get("Items", []))
+
+    for i, q in enumerate(queries[1:], 1):
+        pending[_listing_pool.submit(ddb.query, **q)] = i
+    _consume(0, ddb.query(**queries[0]))
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            _consume(pending.pop(future), future.result())
+    return results
+
+
 def list_images(
     user_id: Optional[str] = None,
     tag: Optional[str] = None,
@@ -193,116 +470,163 @@ def list_images(
 ) -> List:
     """List images with optional filters.
 
-    If `user_id` is provided.
+    If `user_id` is provided the `by_user_created` index is queried, otherwise
+    every shard of the `by_shard_created` index; tags are applied as a filter
+    on either. Results are in `created_at` order.
     """
-    table = dynamodb_table_factory()
-
-    items: List[Dict[str, Any]] = []
-    exclusive_start_key = None
-
-    if user_id:
-        key_expr = Key("user_id").eq(user_id)
-        if created_after is not None and created_before is not None:
-            key_expr = key_expr & Key("created_at").between(int(created_after), int(created_before))
-        elif created_after is not None:
-            key_expr = key_expr & Key("created_at").gte(int(created_after))
-        elif created_before is not None:
-            key_expr = key_expr & Key("created_at").lte(int(created_before))
-
-        filter_expr = None
-        if tag:
-            filter_expr = Attr("tags").contains(tag)
-
-        while True:
-            params: Dict[str, Any] = {
-                "IndexName": "by_user_created",
-                "KeyConditionExpression": key_expr,
-            }
-            if filter_expr is not None:
-                params["FilterExpression"] = filter_expr
-            if exclusive_start_key is not None:
-                params["ExclusiveStartKey"] = exclusive_start_key
-
-            resp = table.query(**params)
-            items.extend(resp.get("Items", []))
-            exclusive_start_key = resp.get("LastEvaluatedKey")
-            if not exclusive_start_key:
-                break
+    # An empty range would be a key-condition BETWEEN with its bounds
+    # reversed, which DynamoDB rejects rather than matching nothing
+    if created_after is not None and created_before is not None and created_after > created_before:
+        return []
+
+    table_name = settings.table_name
+    ddb = dynamodb_client_factory()
+
+    values: Dict[str, Any] = {}
+    if tag:
+        values[":tag"] = {"S": tag}
+    if created_after is not None:
+        values[":after"] = {"N": str(int(created_after))}
+    if created_before is not None:
+        values[":before"] = {"N": str(int(created_before))}
+
+    if created_after is not None and created_before is not None:
+        range_expr = " AND created_at BETWEEN :after AND :before"
+    elif created_after is not None:
+        range_expr = " AND created_at >= :after"
+    elif created_before is not None:
+        range_expr = " AND created_at <= :before"
     else:
-        # Fallback to full table scan (use sparingly in production)
-        filter_expr = None
+        range_expr = ""
+
+    def _query(index_name: str, key_expr: str, pk: str) -> Dict[str, Any]:
+        params: Dict[str, Any] = {
+            "TableName": table_name,
+            "IndexName": index_name,
+            "KeyConditionExpression": key_expr + range_expr,
+            "ExpressionAttributeValues": {**values, ":pk": {"S": pk}},
+        }
         if tag:
-            filter_expr = Attr("tags").contains(tag)
-        if created_after is not None:
-            fe = Attr("created_at").gte(int(created_after))
-            filter_expr = fe if filter_expr is None else (filter_expr & fe)
-        if created_before is not None:
-            fe = Attr("created_at").lte(int(created_before))
-            filter_expr = fe if filter_expr is None else (filter_expr & fe)
-
-        while True:
-            params: Dict[str, Any] = {}
-            if filter_expr is not None:
-                params["FilterExpression"] = filter_expr
-            if exclusive_start_key is not None:
-                params["ExclusiveStartKey"] = exclusive_start_key
-
-            resp = table.scan(**params)
-            items.extend(resp.get("Items", []))
-            exclusive_start_key = resp.get("LastEvaluatedKey")
-            if not exclusive_start_key:
-                break
+            params["FilterExpression"] = "contains(tags, :tag)"
+        return params
+
+    if user_id:
+        return _run_queries(ddb, [_query("by_user_created", "user_id = :pk", user_id)])[0]
+
+    # Indexed range reads over every shard replace a full table scan; the
+    # shards are queried in parallel and merged back into created_at order.
+    shard_queries = [
+        _query("by_shard_created", "list_shard = :pk", str(shard))
+        for shard in range(LISTING_SHARD_COUNT)
+    ]
+    return list(
+        heapq.merge(
+            *_run_queries(ddb, shard_queries), key=lambda item: item["created_at"]
+        )
+    )
+
+
+def _forget_presigned(image_id: str) -> None:
+    """Drop any cached presigned URLs for an image, including in-flight misses."""
+    global _presign_generation, _presign_pruned_generation
+    with _presign_lock:
+        for download in (False, True):
+            _presign_cache.pop((image_id, download), None)
+        _presign_generation += 1
+        _presign_invalidated[image_id] = _presign_generation
+        _presign_invalidated.move_to_end(image_id)
+        while len(_presign_invalidated) > _PRESIGN_CACHE_SIZE:
+            _presign_pruned_generation = _presign_invalidated.popitem(last=False)[1]
 
-    return items
 
 def presigned_get(image_id: str, download: bool = False) -> dict:
     """Create a short-lived URL to fetch an object from S3.
 
     Set `download=True` to suggest a download in the browser (attachment),
     otherwise it will try to display inline if supported.
+
+    Results are cached in-process until shortly before the URL expires, so
+    repeated calls skip both the DynamoDB lookup and the signing. Because a
+    hit never sees the record, every path that rewrites or removes a record
+    (`finalize_image`, `delete_image`, upload rollback) must evict it with
+    `_forget_presigned`.
     """
-    table = dynamodb_table_factory()
+    cache_key = (image_id, download)
+    now = time.monotonic()
+    with _presign_lock:
+        hit = _presign_cache.get(cache_key)
+        if hit is not None and hit[0] > now:
+            _presign_cache.move_to_end(cache_key)
+            return hit[1]
+        started = _presign_generation
+
+    table_name = settings.table_name
+    url_expiry = int(settings.url_expiry)
+    ddb = dynamodb_client_factory()
     s3 = s3_client_factory()
 
-    resp = table.get_item(Key={"image_id": image_id})
-    item = resp.get("Item")
-    if not item:
-        raise KeyError("not_found")
-
-    bucket = item["bucket_name"]
-    key = item["object_key"]
-    filename = item.get("filename", "file")
+    record = _get_record(ddb, table_name, image_id)
+    bucket = record["bucket"]
+    key = record["key"]
+    filename = record["filename"]
 
     disposition = "attachment" if download else "inline"
     content_disp = f"{disposition}; filename=\"{filename}\""
 
-    url = s3.generate_presigned_url(
-        ClientMethod="get_object",
-        Params={
-            "Bucket": bucket,
-            "Key": key,
-            "ResponseContentDisposition": content_disp,
-        },
-        ExpiresIn=int(settings.url_expiry),
-    )
-    return {"url": url}
+    url = _presign_get_object(s3, bucket, key, url_expiry, content_disposition=content_disp)
+    result = {"url": url}
+
+    # Never hand out a cached URL that is about to expire
+    ttl = url_expiry - _PRESIGN_CACHE_MARGIN
+    if ttl > 0:
+        with _presign_lock:
+            # Skip caching if the record was rewritten or removed meanwhile
+            invalidated = _presign_invalidated.get(image_id, _presign_pruned_generation)
+            if invalidated <= started:
+                _presign_cache[cache_key] = (now + ttl, result)
+                _presign_cache.move_to_end(cache_key)
+                while len(_presign_cache) > _PRESIGN_CACHE_SIZE:
+                    _presign_cache.popitem(last=False)
+    return result
 
 def delete_image(image_id: str) -> None:
-    """Delete both the S3 object and the DynamoDB record."""
-    table = dynamodb_table_factory()
+    """Delete both the S3 object and the DynamoDB record.
+
+    The record is removed first with a conditional delete that also returns
+    it, which tells us the S3 location without a separate GetItem. If the S3
+    delete then fails the record is put back, so the image stays findable
+    and the delete can be retried instead of leaking the object.
+    """
+    table_name = settings.table_name
+    ddb = dynamodb_client_factory()
     s3 = s3_client_factory()
 
-    resp = table.get_item(Key={"image_id": image_id})
-    item = resp.get("Item")
-    if not item:
+    try:
+        resp = ddb.delete_item(
+            TableName=table_name,
+            Key={"image_id": {"S": image_id}},
+            ConditionExpression="attribute_exists(image_id)",
+            ReturnValues="ALL_OLD",
+        )
+    except ddb.exceptions.ConditionalCheckFailedException:
         raise KeyError("not_found")
+    item = resp["Attributes"]
 
-    bucket = item["bucket_name"]
-    key = item["object_key"]
-
-    s3.delete_object(Bucket=bucket, Key=key)
-    table.delete_item(Key={"image_id": image_id})
-
+    try:
+        s3.delete_object(Bucket=item["bucket_name"]["S"], Key=item["object_key"]["S"])
+    except Exception:
+        # Best-effort restore; never clobber a record written in the meantime
+        try:
+            ddb.put_item(
+                TableName=table_name,
+                Item=item,
+                ConditionExpression="attribute_not_exists(image_id)",
+            )
+        except Exception:
+            pass
+        raise
+    finally:
+        _forget_presigned(image_id)
 
 def get_image_stream(image_id: str) -> Dict[str, Any]:
     """Fetch S3 object stream and basic headers for an image by id.
@@ -310,21 +634,22 @@ def get_image_stream(image_id: str) -> Dict[str, Any]:
     Returns a dict with keys: body (StreamingBody), content_type, filename,
     content_length, bucket, key.
     """
-    table = dynamodb_table_factory()
+    table_name = settings.table_name
+    ddb = dynamodb_client_factory()
     s3 = s3_client_factory()
 
-    resp = table.get_item(Key={"image_id": image_id})
-    item = resp.get("Item")
-    if not item:
-        raise KeyError("not_found")
-
-    bucket = item["bucket_name"]
-    key = item["object_key"]
-    filename = item.get("filename", "file")
+    record = _get_record(ddb, table_name, image_id)
+    bucket = record["bucket"]
+    key = record["key"]
+    filename = record["filename"]
 
-    obj = s3.get_object(Bucket=bucket, Key=key)
+    try:
+        obj = s3.get_object(Bucket=bucket, Key=key)
+    except s3.exceptions.NoSuchKey:
+        # Record written but the upload not finished (or rolled back)
+        raise KeyError("not_found")
     body = obj["Body"]
-    content_type = obj.get("ContentType") or item.get("content_type") or "application/octet-stream"
+    content_type = obj.get("ContentType") or record["content_type"] or "application/octet-stream"
     content_length = obj.get("ContentLength")
 
     return {
@@ -352,46 +677,56 @@ def finalize_image(
 
     This is intended for serverless presigned-upload flows where the client uploads
     directly to S3, and we later (or via S3 event) persist metadata in DynamoDB.
-    The function reads the object to auto-extract metadata and records item fields.
+    The function reads the object's header to auto-extract metadata and records
+    item fields.
     """
-    table = dynamodb_table_factory()
+    bucket = settings.bucket_name
+    table_name = settings.table_name
+    ddb = dynamodb_client_factory()
     s3 = s3_client_factory()
 
     object_key = f"{user_id}/{image_id}/{filename}"
     try:
-        head = s3.head_object(Bucket=settings.bucket_name, Key=object_key)
+        head = s3.head_object(Bucket=bucket, Key=object_key)
     except Exception as e:
         raise KeyError("not_found") from e
 
-    # Fetch the object to extract auto metadata (dimensions/EXIF)
-    obj = s3.get_object(Bucket=settings.bucket_name, Key=object_key)
-    data_bytes = obj["Body"].read()
-    auto_meta = _extract_image_metadata(data_bytes)
+    size = int(head.get("ContentLength", 0))
+
+    # Dimensions/EXIF live in the file header, so fetch only a prefix of the
+    # object and widen the range once if that was too short to parse. This
+    # relies on _extract_image_metadata never decoding pixels, which would
+    # fail on the truncated prefix.
+    auto_meta: Dict[str, Any] = {}
+    if size:
+        for range_end in _HEADER_RANGE_ENDS:
+            obj = s3.get_object(
+                Bucket=bucket, Key=object_key, Range=f"bytes=0-{range_end}"
+            )
+            auto_meta, fmt = _extract_image_metadata(obj["Body"].read())
+            if fmt is not None or range_end + 1 >= size:
+                break
 
     created_at = int(time.time())
-    size = int(head.get("ContentLength", len(data_bytes)))
     ctype = content_type or head.get("ContentType") or "application/octet-stream"
 
-    item: Dict[str, Any] = {
-        "image_id": image_id,
-        "user_id": user_id,
-        "created_at": created_at,
-        "filename": filename,
-        "content_type": ctype,
-        "size": size,
-        "bucket_name": settings.bucket_name,
-        "object_key": object_key,
-    }
-    if auto_meta:
-        item["auto_metadata"] = auto_meta
-    if metadata is not None:
-        item["user_metadata"] = metadata
-    if title is not None:
-        item["title"] = title
-    if description is not None:
-        item["description"] = description
-    if tags is not None:
-        item["tags"] = tags
+    item = _image_item(
+        image_id=image_id,
+        user_id=user_id,
+        created_at=created_at,
+        filename=filename,
+        content_type=ctype,
+        size=size,
+        bucket=bucket,
+        object_key=object_key,
+        auto_meta=auto_meta,
+        metadata=metadata,
+        title=title,
+        description=description,
+        tags=tags,
+    )
 
-    table.put_item(Item=item)
+    ddb.put_item(TableName=table_name, Item=item)
+    # An overwrite may point the record at a different object key
+    _forget_presigned(image_id)
     return {"image_id": image_id}
@@ -14,5 +14,7 @@ class Settings(BaseModel):
     bucket_name: str = os.getenv("BUCKET_NAME", "images")
     table_name: str = os.getenv("TABLE_NAME", "images")
     url_expiry: int = int(os.getenv("URL_EXPIRY", "900"))
+    max_upload_bytes: int = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+    max_image_pixels: int = int(os.getenv("MAX_IMAGE_PIXELS", str(50_000_000)))
 
 settings = Settings()
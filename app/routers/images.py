@@ -1,10 +1,11 @@
 from fastapi import APIRouter, HTTPException, Query, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
 from typing import Optional, List
-import json
+import orjson
 from ..core.models import UploadResponse, ListResponse
 from ..aws.storage import (
-    put_image_bytes,
+    put_image_fileobj,
     list_images as list_store,
     delete_image as delete_store,
     get_image_stream,
@@ -14,12 +15,16 @@ router = APIRouter(prefix="/images", tags=["images"])
 
 # Acceptable image types
 ALLOWED_IMAGE_CONTENT_TYPES = {"image/jpeg", "image/png"}
-ALLOWED_IMAGE_EXTS = {".jpg", ".jpeg", ".png"}
+# Extensions are tuples so they can be passed straight to str.endswith
+ALLOWED_IMAGE_EXTS = (".jpg", ".jpeg", ".png")
 CTYPE_TO_EXTS = {
-    "image/jpeg": {".jpg", ".jpeg"},
-    "image/png": {".png"},
+    "image/jpeg": (".jpg", ".jpeg"),
+    "image/png": (".png",),
 }
 
+# Read size for streamed downloads; large reads keep per-chunk overhead low
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
 
 # Upload an image file via multipart form-data. This is easier for users
 # (browse a file) and avoids base64 payloads entirely.
@@ -47,23 +52,22 @@ async def upload_file(
     tags: Optional[str] = Form(None, description="Comma-separated tags (e.g. 'summer,beach')"),
 ):
     try:
-        data = await file.read()
         content_type = file.content_type or "application/octet-stream"
 
         # Basic validation: only allow JPEG or PNG, and common file extensions
         name_lower = (file.filename or "").lower()
-        valid_ext = any(name_lower.endswith(e) for e in ALLOWED_IMAGE_EXTS)
+        valid_ext = name_lower.endswith(ALLOWED_IMAGE_EXTS)
         # Require both: supported content-type and extension, and they must match
         if content_type not in ALLOWED_IMAGE_CONTENT_TYPES or not valid_ext:
             raise ValueError("unsupported_image_type")
         # Ensure extension matches declared content-type
-        expected_exts = CTYPE_TO_EXTS.get(content_type, set())
-        if not any(name_lower.endswith(e) for e in expected_exts):
+        expected_exts = CTYPE_TO_EXTS.get(content_type, ())
+        if not name_lower.endswith(expected_exts):
             raise ValueError("unsupported_image_type")
         parsed_metadata = None
         if metadata:
             try:
-                parsed_metadata = json.loads(metadata)
+                parsed_metadata = orjson.loads(metadata)
                 if not isinstance(parsed_metadata, dict):
                     raise ValueError("metadata_must_be_object")
             except Exception:
@@ -72,12 +76,16 @@ async def upload_file(
         if tags:
             parsed_tags = [t.strip() for t in tags.split(",") if t.strip()]
 
+        # Storage calls are blocking boto3 I/O; keep them off the event loop.
+        # The upload's spooled temp file is handed over as-is and streamed
+        # to S3 instead of being read into memory first.
         return UploadResponse(
-            **put_image_bytes(
+            **await run_in_threadpool(
+                put_image_fileobj,
                 user_id=user_id,
                 filename=file.filename,
                 content_type=content_type,
-                data_bytes=data,
+                fileobj=file.file,
                 metadata=parsed_metadata,
                 title=title,
                 description=description,
@@ -85,7 +93,9 @@ async def upload_file(
             )
         )
     except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        # Size-limit rejections are 413 Payload Too Large; other validation errors are 400
+        status_code = 413 if str(e) == "file_too_large" else 400
+        raise HTTPException(status_code=status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"upload_failed {e}")
 
@@ -99,7 +109,7 @@ async def upload_file(
         "- `user_id`: return only images for this user.\n"
         "- `tag`: return only images that include this tag.\n"
         "- `created_after`/`created_before`: Unix seconds, inclusive.\n\n"
-        "When `user_id` is provided the query uses an index for better performance."
+        "Listing always reads a `created_at`-sorted index; `user_id` narrows it to that user's images."
     ),
 )
 def list_images(
@@ -154,12 +164,7 @@ def download_image(image_id: str):
         info = get_image_stream(image_id)
 
         def _iter():
-            stream = info["body"]
-            while True:
-                chunk = stream.read(8192)
-                if not chunk:
-                    break
-                yield chunk
+            yield from info["body"].iter_chunks(chunk_size=DOWNLOAD_CHUNK_SIZE)
 
         headers = {
             "Content-Disposition": f"attachment; filename=\"{info['filename']}\""
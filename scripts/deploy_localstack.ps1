@@ -13,8 +13,35 @@ if (-not $TableName) { $TableName = 'Images' }
 if (-not $Env:AWS_ACCESS_KEY_ID) { $Env:AWS_ACCESS_KEY_ID = 'test' }
 if (-not $Env:AWS_SECRET_ACCESS_KEY) { $Env:AWS_SECRET_ACCESS_KEY = 'test' }
 
+# Must match LISTING_SHARD_COUNT in app/aws/storage.py
+$ListingShardCount = 4
+
 Write-Host "Ensure LocalStack resources (Region=$Region, Endpoint=$Endpoint)"
 
+# Run an AWS CLI command with its parameters passed via --cli-input-json
+function Invoke-AwsJson([string]$Service, [string]$Command, $Spec) {
+    $json = $Spec | ConvertTo-Json -Depth 8
+    $tmp = [System.IO.Path]::ChangeExtension([System.IO.Path]::GetTempFileName(), '.json')
+    # Write UTF-8 without BOM to avoid AWS CLI JSON parsing issues on Windows PowerShell 5
+    $utf8NoBom = New-Object System.Text.UTF8Encoding($false)
+    [System.IO.File]::WriteAllBytes($tmp, $utf8NoBom.GetBytes($json))
+    try {
+        $uriPath = $tmp -replace '\\','/'
+        aws $Service $Command --endpoint-url $Endpoint --region $Region --cli-input-json "file://$uriPath"
+    }
+    finally {
+        Remove-Item -Path $tmp -ErrorAction SilentlyContinue
+    }
+}
+
+$ShardIndex = @{ IndexName = 'by_shard_created'
+    KeySchema = @(
+        @{ AttributeName = 'list_shard'; KeyType = 'HASH' }
+        @{ AttributeName = 'created_at'; KeyType = 'RANGE' }
+    )
+    Projection = @{ ProjectionType = 'ALL' }
+}
+
 # Ensure S3 bucket exists
 Write-Host "Ensuring S3 bucket '$BucketName'..."
 aws s3 ls "s3://$BucketName" --endpoint-url $Endpoint --region $Region *> $null
@@ -34,6 +61,7 @@ if ($LASTEXITCODE -ne 0) {
             @{ AttributeName = 'image_id'; AttributeType = 'S' }
             @{ AttributeName = 'user_id'; AttributeType = 'S' }
             @{ AttributeName = 'created_at'; AttributeType = 'N' }
+            @{ AttributeName = 'list_shard'; AttributeType = 'S' }
         )
         KeySchema = @(@{ AttributeName = 'image_id'; KeyType = 'HASH' })
         BillingMode = 'PAY_PER_REQUEST'
@@ -45,23 +73,70 @@ if ($LASTEXITCODE -ne 0) {
                )
                Projection = @{ ProjectionType = 'ALL' }
             }
+            $ShardIndex
         )
     }
 
-    $json = $spec | ConvertTo-Json -Depth 6
-    $tmp = [System.IO.Path]::ChangeExtension([System.IO.Path]::GetTempFileName(), '.json')
-    # Write UTF-8 without BOM to avoid AWS CLI JSON parsing issues on Windows PowerShell 5
-    $utf8NoBom = New-Object System.Text.UTF8Encoding($false)
-    [System.IO.File]::WriteAllBytes($tmp, $utf8NoBom.GetBytes($json))
-    try {
-        $uriPath = $tmp -replace '\\','/'
-        aws dynamodb create-table --endpoint-url $Endpoint --region $Region --cli-input-json "file://$uriPath" | Out-Host
-    }
-    finally {
-        Remove-Item -Path $tmp -ErrorAction SilentlyContinue
-    }
+    Invoke-AwsJson dynamodb create-table $spec | Out-Host
 } else {
     Write-Host "Table already exists: $TableName"
+
+    # Tables created before listings moved off Scan lack the by_shard_created index
+    $indexes = aws dynamodb describe-table --table-name $TableName --endpoint-url $Endpoint --region $Region `
+        --query "Table.GlobalSecondaryIndexes[].IndexName" --output json | ConvertFrom-Json
+    if ($indexes -notcontains 'by_shard_created') {
+        Write-Host "Adding index 'by_shard_created'..."
+        $update = [ordered]@{
+            TableName = $TableName
+            AttributeDefinitions = @(
+                @{ AttributeName = 'created_at'; AttributeType = 'N' }
+                @{ AttributeName = 'list_shard'; AttributeType = 'S' }
+            )
+            GlobalSecondaryIndexUpdates = @(@{ Create = $ShardIndex })
+        }
+        Invoke-AwsJson dynamodb update-table $update | Out-Null
+        if ($LASTEXITCODE -ne 0) {
+            Write-Error "Failed to add index 'by_shard_created' to '$TableName'."
+            exit 1
+        }
+        # Poll for up to ~2 minutes; a missing status means the index was dropped
+        $status = $null
+        for ($try = 0; $try -lt 60 -and $status -ne 'ACTIVE'; $try++) {
+            Start-Sleep -Seconds 2
+            $status = aws dynamodb describe-table --table-name $TableName --endpoint-url $Endpoint --region $Region `
+                --query "Table.GlobalSecondaryIndexes[?IndexName=='by_shard_created'].IndexStatus" --output text
+            if ($LASTEXITCODE -ne 0 -or -not $status -or $status -eq 'None') {
+                Write-Error "Index 'by_shard_created' on '$TableName' has no status; its creation was rejected."
+                exit 1
+            }
+        }
+        if ($status -ne 'ACTIVE') {
+            Write-Error "Index 'by_shard_created' on '$TableName' is still '$status' after 2 minutes."
+            exit 1
+        }
+    }
+}
+
+# Backfill list_shard on records written before it existed; without it they
+# are missing from listings that aren't filtered by user. Listings query every
+# shard, so any spread works; new writes use a hash of image_id instead.
+Write-Host "Backfilling 'list_shard'..."
+$ids = aws dynamodb scan --table-name $TableName --endpoint-url $Endpoint --region $Region `
+    --filter-expression "attribute_not_exists(list_shard)" --projection-expression image_id `
+    --query "Items[].image_id.S" --output json | ConvertFrom-Json
+$n = 0
+foreach ($id in @($ids | Where-Object { $_ })) {
+    $update = [ordered]@{
+        TableName = $TableName
+        Key = @{ image_id = @{ S = $id } }
+        UpdateExpression = 'SET list_shard = :shard'
+        # Skip records deleted or rewritten since the scan
+        ConditionExpression = 'attribute_exists(image_id) AND attribute_not_exists(list_shard)'
+        ExpressionAttributeValues = @{ ':shard' = @{ S = [string]($n % $ListingShardCount) } }
+    }
+    Invoke-AwsJson dynamodb update-item $update *> $null
+    if ($LASTEXITCODE -eq 0) { $n++ }
 }
+Write-Host "Backfilled $n record(s)."
 
 Write-Host "LocalStack resources ensured."
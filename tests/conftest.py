@@ -0,0 +1,190 @@
+import os, struct, threading, zlib
+from types import SimpleNamespace
+
+import boto3
+import pytest
+from fastapi.testclient import TestClient
+from moto import mock_aws
+
+from app.core.config import settings
+from app.aws import storage
+from app.main import app
+
+
+def _pack_png(width: int, height: int, rgb=(255, 0, 0)) -> bytes:
+    """Encode a solid-colour RGB PNG with plain zlib/CRC (no Pillow needed)."""
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)  # 8-bit RGB
+    scanlines = (b"\x00" + bytes(rgb) * width) * height  # filter type 0 per row
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", ihdr)
+        + chunk(b"IDAT", zlib.compress(scanlines))
+        + chunk(b"IEND", b"")
+    )
+
+
+REGION = "us-east-1"
+# Unique per pytest-xdist worker (each worker is its own session), so
+# parallel runs never share mocked resources
+_WORKER = os.environ.get("PYTEST_XDIST_WORKER", "gw0")
+BUCKET_NAME = f"test-bucket-{_WORKER}"
+TABLE_NAME = f"Images-{_WORKER}"
+
+# Table layout the app expects (mirrors scripts/deploy_localstack.ps1)
+_TABLE_SCHEMA = {
+    "AttributeDefinitions": (
+        {"AttributeName": "image_id", "AttributeType": "S"},
+        {"AttributeName": "user_id", "AttributeType": "S"},
+        {"AttributeName": "created_at", "AttributeType": "N"},
+        {"AttributeName": "list_shard", "AttributeType": "S"},
+    ),
+    "KeySchema": ({"AttributeName": "image_id", "KeyType": "HASH"},),
+    "BillingMode": "PAY_PER_REQUEST",
+    "GlobalSecondaryIndexes": (
+        {
+            "IndexName": "by_user_created",
+            "KeySchema": (
+                {"AttributeName": "user_id", "KeyType": "HASH"},
+                {"AttributeName": "created_at", "KeyType": "RANGE"},
+            ),
+            "Projection": {"ProjectionType": "ALL"},
+        },
+        {
+            "IndexName": "by_shard_created",
+            "KeySchema": (
+                {"AttributeName": "list_shard", "KeyType": "HASH"},
+                {"AttributeName": "created_at", "KeyType": "RANGE"},
+            ),
+            "Projection": {"ProjectionType": "ALL"},
+        },
+    ),
+}
+
+
+@pytest.fixture(scope="session")
+def png_bytes() -> bytes:
+    """A tiny 2x2 PNG, built once per session."""
+    return _pack_png(2, 2)
+
+
+@pytest.fixture(scope="session")
+def boto_session():
+    """One boto3 Session for the test process so service models load once."""
+    return boto3.session.Session(
+        aws_access_key_id="test",
+        aws_secret_access_key="test",
+        region_name=REGION,
+    )
+
+
+@pytest.fixture(scope="session")
+def s3_client(boto_session):
+    return boto_session.client("s3")
+
+
+@pytest.fixture(scope="session")
+def ddb_client(boto_session):
+    return boto_session.client("dynamodb")
+
+
+@pytest.fixture(scope="session")
+def ddb_table(boto_session):
+    """Resource-level handle on the test table, for readable assertions."""
+    return boto_session.resource("dynamodb").Table(TABLE_NAME)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def aws_backend(s3_client, ddb_client):
+    """Start moto once per session and create the bucket/table the app expects.
+
+    The mock is held open for the whole session with start()/stop(), so
+    moto's backends and request hooks are set up a single time.
+    """
+    mock = mock_aws()
+    mock.start()
+    try:
+        with pytest.MonkeyPatch.context() as mp:
+            # Route boto3 to moto (no endpoint), use test resources
+            mp.setattr(settings, "aws_endpoint_url", None)
+            mp.setattr(settings, "aws_region", REGION)
+            mp.setattr(settings, "bucket_name", BUCKET_NAME)
+            mp.setattr(settings, "table_name", TABLE_NAME)
+            mp.setattr(settings, "url_expiry", 60)
+
+            s3_client.create_bucket(Bucket=BUCKET_NAME)
+            ddb_client.create_table(TableName=TABLE_NAME, **_TABLE_SCHEMA)
+
+            yield
+
+    finally:
+        mock.stop()
+
+
+def _reset_backend(s3, dynamodb):
+    """Empty the shared bucket and table; far cheaper than recreating them."""
+    listing = s3.list_objects_v2(Bucket=BUCKET_NAME)
+    objects = [{"Key": o["Key"]} for o in listing.get("Contents", [])]
+    if objects:
+        s3.delete_objects(Bucket=BUCKET_NAME, Delete={"Objects": objects})
+
+    scan = dynamodb.scan(TableName=TABLE_NAME, ProjectionExpression="image_id")
+    for key in scan.get("Items", []):
+        dynamodb.delete_item(TableName=TABLE_NAME, Key=key)
+
+
+@pytest.fixture
+def aws_mock(aws_backend, s3_client, ddb_client):
+    """Function-scoped access to the shared mocked AWS backend.
+
+    Each test starts with an empty bucket and table, and no cached
+    presigned URLs.
+    """
+    yield
+    _reset_backend(s3_client, ddb_client)
+    with storage._presign_lock:
+        storage._presign_cache.clear()
+
+
+@pytest.fixture(scope="session")
+def client():
+    """One TestClient for the whole session; the app is built once at import."""
+    return TestClient(app)
+
+
+class _Spy:
+    """Callable stand-in that records each call and forwards it to `real`.
+
+    Each entry in `calls` has the call's `args`, `kwargs`, `thread` and
+    `result`. `before(*args, **kwargs)`, when set, runs ahead of the real
+    call; it may raise to simulate a failure or return replacement kwargs.
+    """
+
+    def __init__(self, real, before=None):
+        self.real = real
+        self.before = before
+        self.calls = []
+
+    def __call__(self, *args, **kwargs):
+        call = SimpleNamespace(args=args, kwargs=kwargs, thread=threading.current_thread(), result=None)
+        self.calls.append(call)
+        if self.before is not None:
+            kwargs = self.before(*args, **kwargs) or kwargs
+        call.result = self.real(*args, **kwargs)
+        return call.result
+
+
+@pytest.fixture
+def spy(monkeypatch):
+    """Replace `obj.name` with a recording `_Spy` for the current test.
+
+    Usage: `query = spy(ddb, "query", before=...)`, then inspect `query.calls`.
+    """
+    def _install(obj, name, before=None):
+        wrapper = _Spy(getattr(obj, name), before)
+        monkeypatch.setattr(obj, name, wrapper)
+        return wrapper
+
+    return _install
@@ -1,67 +1,19 @@
-import os, sys, json
-from io import BytesIO
+import hashlib
+import json
 
-import boto3
 import pytest
-from fastapi.testclient import TestClient
-from moto import mock_aws
-from PIL import Image
-
-# Ensure project root on sys.path so `import app...` works
-ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-if ROOT not in sys.path:
-    sys.path.insert(0, ROOT)
 
 from app.core.config import settings
-from app.main import app
-from app.aws.clients import dynamodb_table as dynamodb_table_factory
 
 
-def _png_bytes(size=(3, 2), color=(0, 128, 255)) -> bytes:
-    img = Image.new("RGB", size, color=color)
-    buf = BytesIO()
-    img.save(buf, format="PNG")
-    return buf.getvalue()
+@pytest.fixture
+def api_mock(aws_mock, client):
+    yield client
 
 
-@pytest.fixture
-def api_mock(monkeypatch):
-    with mock_aws():
-        # Route boto3 to moto (no endpoint), use test resources
-        monkeypatch.setattr(settings, "aws_endpoint_url", None)
-        monkeypatch.setattr(settings, "aws_region", "us-east-1")
-        monkeypatch.setattr(settings, "bucket_name", "test-bucket")
-        monkeypatch.setattr(settings, "table_name", "Images")
-
-        s3 = boto3.client("s3", region_name=settings.aws_region)
-        s3.create_bucket(Bucket=settings.bucket_name)
-        dynamodb = boto3.client("dynamodb", region_name=settings.aws_region)
-        dynamodb.create_table(
-            TableName=settings.table_name,
-            AttributeDefinitions=[
-                {"AttributeName": "image_id", "AttributeType": "S"},
-                {"AttributeName": "user_id", "AttributeType": "S"},
-                {"AttributeName": "created_at", "AttributeType": "N"},
-            ],
-            KeySchema=[{"AttributeName": "image_id", "KeyType": "HASH"}],
-            BillingMode="PAY_PER_REQUEST",
-            GlobalSecondaryIndexes=[
-                {
-                    "IndexName": "by_user_created",
-                    "KeySchema": [
-                        {"AttributeName": "user_id", "KeyType": "HASH"},
-                        {"AttributeName": "created_at", "KeyType": "RANGE"},
-                    ],
-                    "Projection": {"ProjectionType": "ALL"},
-                }
-            ],
-        )
-        yield TestClient(app)
-
-
-def test_images_uploadfile_list_download_delete_success(api_mock):
+def test_images_uploadfile_list_download_delete_success(api_mock, png_bytes):
     client = api_mock
-    data = _png_bytes()
+    data = png_bytes
 
     # Upload a valid PNG
     files = {
@@ -82,12 +34,21 @@ def test_images_uploadfile_list_download_delete_success(api_mock):
     assert body["items"][0]["user_id"] == "u1"
     assert body["items"][0].get("tags") == ["tagA", "tagB"]
 
+    # Unfiltered listing reads the shard index; its key isn't exposed
+    r = client.get("/images")
+    assert r.status_code == 200, r.text
+    assert [i["image_id"] for i in r.json()["items"]] == [image_id]
+    assert "list_shard" not in r.json()["items"][0]
+
     # Download stream
-    r = client.get(f"/images/{image_id}/download")
-    assert r.status_code == 200
-    assert r.headers.get("content-type", "").startswith("image/")
-    assert "attachment" in r.headers.get("content-disposition", "").lower()
-    assert r.content == data
+    with client.stream("GET", f"/images/{image_id}/download") as r:
+        assert r.status_code == 200
+        assert r.headers.get("content-type", "").startswith("image/")
+        assert "attachment" in r.headers.get("content-disposition", "").lower()
+        digest = hashlib.sha256()
+        for chunk in r.iter_bytes(65536):
+            digest.update(chunk)
+    assert digest.digest() == hashlib.sha256(data).digest()
 
     # Delete and verify gone
     r = client.delete(f"/images/{image_id}")
@@ -105,9 +66,9 @@ def test_images_uploadfile_unsupported_type_failure(api_mock):
     assert r.json()["detail"] == "unsupported_image_type"
 
 
-def test_images_uploadfile_metadata_parsing_success(api_mock):
+def test_images_uploadfile_metadata_parsing_success(api_mock, ddb_table, png_bytes):
     client = api_mock
-    data = _png_bytes()
+    data = png_bytes
 
     # Invalid JSON
     files = {"file": ("img.png", data, "image/png")}
@@ -130,17 +91,16 @@ def test_images_uploadfile_metadata_parsing_success(api_mock):
     assert r.status_code == 201
     image_id = r.json()["image_id"]
 
-    table = dynamodb_table_factory()
-    item = table.get_item(Key={"image_id": image_id}).get("Item")
+    item = ddb_table.get_item(Key={"image_id": image_id}).get("Item")
     assert item is not None
     assert "auto_metadata" in item
     assert item["auto_metadata"]["width"] > 0
     assert item.get("user_metadata", {}).get("custom") == "yes"
 
 
-def test_images_uploadfile_mismatched_extension_failure(api_mock):
+def test_images_uploadfile_mismatched_extension_failure(api_mock, png_bytes):
     client = api_mock
-    data = _png_bytes()
+    data = png_bytes
     # Filename says .jpg but content-type is image/png → reject
     files = {"file": ("a.jpg", data, "image/png")}
     r = client.post("/images/upload-file", files=files, data={"user_id": "u1"})
@@ -163,14 +123,22 @@ def test_images_delete_404_failure(api_mock):
     assert r.status_code == 404
 
 
-def test_images_list_without_filters_success(api_mock):
+def test_images_list_without_filters_success(api_mock, png_bytes):
     client = api_mock
-    d1 = _png_bytes(); d2 = _png_bytes()
-    r = client.post("/images/upload-file", files={"file": ("a.png", d1, "image/png")}, data={"user_id": "u1"})
+    r = client.post("/images/upload-file", files={"file": ("a.png", png_bytes, "image/png")}, data={"user_id": "u1"})
     assert r.status_code == 201
-    r = client.post("/images/upload-file", files={"file": ("b.png", d2, "image/png")}, data={"user_id": "u2"})
+    r = client.post("/images/upload-file", files={"file": ("b.png", png_bytes, "image/png")}, data={"user_id": "u2"})
     assert r.status_code == 201
     r = client.get("/images")
     assert r.status_code == 200
     body = r.json()
     assert body["count"] == 2
+
+
+def test_images_uploadfile_too_large_failure(api_mock, monkeypatch, png_bytes):
+    client = api_mock
+    monkeypatch.setattr(settings, "max_upload_bytes", len(png_bytes) - 1)
+    files = {"file": ("img.png", png_bytes, "image/png")}
+    r = client.post("/images/upload-file", files=files, data={"user_id": "u1"})
+    assert r.status_code == 413
+    assert r.json()["detail"] == "file_too_large"
@@ -1,80 +1,44 @@
-import os, sys
+import base64
+import binascii
+import os
+import re
+import threading
 import urllib.parse as urlparse
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
-from moto import mock_aws
-import boto3
-from PIL import Image
+from PIL import Image, ExifTags
 from io import BytesIO
 
-# Ensure project root on path for `import app...`
-ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-if ROOT not in sys.path:
-    sys.path.insert(0, ROOT)
-
 from app.core.config import settings
 from app.aws import storage
-from app.aws.clients import s3 as s3_client_factory, dynamodb_table as dynamodb_table_factory
-
-
-@pytest.fixture(autouse=False)
-def aws_mock(monkeypatch):
-    with mock_aws():
-        # Ensure our clients do not try to hit a custom endpoint in tests
-        monkeypatch.setattr(settings, "aws_endpoint_url", None)
-        monkeypatch.setattr(settings, "aws_region", "us-east-1")
-        monkeypatch.setattr(settings, "bucket_name", "test-bucket")
-        monkeypatch.setattr(settings, "table_name", "Images")
-        monkeypatch.setattr(settings, "url_expiry", 60)
-
-        # Create S3 bucket
-        s3 = boto3.client("s3", region_name=settings.aws_region)
-        s3.create_bucket(Bucket=settings.bucket_name)
-
-        # Create DynamoDB table with expected schema and GSI
-        dynamodb = boto3.client("dynamodb", region_name=settings.aws_region)
-        dynamodb.create_table(
-            TableName=settings.table_name,
-            AttributeDefinitions=[
-                {"AttributeName": "image_id", "AttributeType": "S"},
-                {"AttributeName": "user_id", "AttributeType": "S"},
-                {"AttributeName": "created_at", "AttributeType": "N"},
-            ],
-            KeySchema=[{"AttributeName": "image_id", "KeyType": "HASH"}],
-            BillingMode="PAY_PER_REQUEST",
-            GlobalSecondaryIndexes=[
-                {
-                    "IndexName": "by_user_created",
-                    "KeySchema": [
-                        {"AttributeName": "user_id", "KeyType": "HASH"},
-                        {"AttributeName": "created_at", "KeyType": "RANGE"},
-                    ],
-                    "Projection": {"ProjectionType": "ALL"},
-                }
-            ],
-        )
+from app.aws import clients
 
-        yield
 
+_CD_RE = re.compile(r"[?&]response-content-disposition=([^&]+)")
 
-def _query_params(url: str) -> dict:
-    parsed = urlparse.urlparse(url)
-    return dict(urlparse.parse_qsl(parsed.query))
 
+def _content_disposition(url: str) -> str:
+    """Return the presigned URL's lower-cased content disposition, or ''."""
+    m = _CD_RE.search(url)
+    return urlparse.unquote(m.group(1)).lower() if m else ""
 
-def _png_bytes():
-    # Generate a tiny 2x2 PNG in-memory
-    img = Image.new('RGB', (2, 2), color=(255, 0, 0))
-    buf = BytesIO()
-    img.save(buf, format='PNG')
-    return buf.getvalue()
 
+def test_clients_concurrent_cold_start_success(aws_mock):
+    # Cold construction from many threads at once must not race, and every
+    # client gets a connection pool sized for shared use
+    clients._s3_client.cache_clear()
+    clients._dynamodb_client.cache_clear()
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        built = list(pool.map(lambda i: (clients.s3(), clients.dynamodb())[i % 2], range(32)))
+
+    for c in built:
+        assert c.meta.config.max_pool_connections == clients.MAX_POOL_CONNECTIONS
+    assert clients.dynamodb().describe_table(TableName=settings.table_name)["Table"]
 
-def test_storage_put_presign_delete_flow_success(aws_mock, monkeypatch):
-    # Freeze time for deterministic created_at
-    monkeypatch.setattr("app.aws.storage.time.time", lambda: 1000)
 
-    content = _png_bytes()
+def test_storage_put_presign_delete_flow_success(aws_mock, ddb_table, s3_client, png_bytes):
+    content = png_bytes
     resp = storage.put_image_bytes(
         user_id="u1",
         filename="pic.png",
@@ -84,6 +48,7 @@ def test_storage_put_presign_delete_flow_success(aws_mock, monkeypatch):
         title="t",
         description="d",
         tags=["red", "fun"],
+        clock=lambda: 1000,  # deterministic created_at
     )
 
     assert "image_id" in resp and resp["image_id"]
@@ -92,8 +57,7 @@ def test_storage_put_presign_delete_flow_success(aws_mock, monkeypatch):
     image_id = resp["image_id"]
 
     # Validate DynamoDB item exists
-    table = dynamodb_table_factory()
-    item = table.get_item(Key={"image_id": image_id}).get("Item")
+    item = ddb_table.get_item(Key={"image_id": image_id}).get("Item")
     assert item is not None
     assert item["user_id"] == "u1"
     assert item["filename"] == "pic.png"
@@ -105,50 +69,81 @@ def test_storage_put_presign_delete_flow_success(aws_mock, monkeypatch):
     assert item["auto_metadata"]["height"] > 0
 
     # Validate S3 object exists
-    s3 = s3_client_factory()
-    obj = s3.get_object(Bucket=item["bucket_name"], Key=item["object_key"])  # no exception
+    obj = s3_client.get_object(Bucket=item["bucket_name"], Key=item["object_key"])  # no exception
     assert int(obj["ContentLength"]) == len(content)
 
     # Presigned URL (inline)
     url_inline = storage.presigned_get(image_id=image_id, download=False)["url"]
-    qp = _query_params(url_inline)
-    assert "response-content-disposition" in qp
-    assert "inline" in urlparse.unquote(qp["response-content-disposition"]).lower()
+    assert "inline" in _content_disposition(url_inline)
 
     # Presigned URL (attachment)
     url_attach = storage.presigned_get(image_id=image_id, download=True)["url"]
-    qp = _query_params(url_attach)
-    assert "response-content-disposition" in qp
-    assert "attachment" in urlparse.unquote(qp["response-content-disposition"]).lower()
+    assert "attachment" in _content_disposition(url_attach)
 
     # Delete
     storage.delete_image(image_id)
-    assert table.get_item(Key={"image_id": image_id}).get("Item") is None
+    assert ddb_table.get_item(Key={"image_id": image_id}).get("Item") is None
     with pytest.raises(Exception):
-        s3.get_object(Bucket=item["bucket_name"], Key=item["object_key"])  # should be gone
+        s3_client.get_object(Bucket=item["bucket_name"], Key=item["object_key"])  # should be gone
 
 
-def test_storage_list_images_filters_success(aws_mock, monkeypatch):
-    # Create three images with controlled timestamps via a simple counter
-    counter = {"t": 1000}
-    def fake_time():
-        v = counter["t"]
-        counter["t"] += 500  # 1000, 1500, 2000
-        return v
-    monkeypatch.setattr("app.aws.storage.time.time", fake_time)
+@pytest.mark.parametrize("decoder", ["default", "binascii"])
+def test_storage_put_image_base64_round_trip_success(aws_mock, ddb_table, s3_client, monkeypatch, png_bytes, decoder):
+    # Cover the stdlib fallback as well as whichever decoder is installed
+    if decoder == "binascii":
+        monkeypatch.setattr(storage, "_b64decode", binascii.a2b_base64)
 
-    def up(user, tags):
+    image_id = storage.put_image(
+        user_id="u1",
+        filename="pic.png",
+        content_type="image/png",
+        data_base64=base64.b64encode(png_bytes).decode(),
+    )["image_id"]
+
+    item = ddb_table.get_item(Key={"image_id": image_id})["Item"]
+    obj = s3_client.get_object(Bucket=item["bucket_name"], Key=item["object_key"])
+    assert obj["Body"].read() == png_bytes
+
+    with pytest.raises(ValueError, match="invalid_base64"):
+        storage.put_image(
+            user_id="u1", filename="pic.png", content_type="image/png", data_base64="abc"
+        )
+
+
+def test_storage_list_images_filters_success(aws_mock, ddb_table, png_bytes):
+    # Create three images with controlled timestamps. Uploads run in
+    # parallel, so each one gets its own fixed clock rather than sharing a
+    # counter whose order would depend on thread scheduling.
+    def up(user, tags, created_at):
         return storage.put_image_bytes(
             user_id=user,
             filename="img.png",
             content_type="image/png",
-            data_bytes=_png_bytes(),
+            data_bytes=png_bytes,
             tags=tags,
+            clock=lambda: created_at,
         )
 
-    up("u1", ["tag1"])   # created_at 1000
-    up("u1", ["tag2"])   # created_at 1500
-    up("u2", ["tag1", "tag3"])  # created_at 2000
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [
+            pool.submit(up, "u1", ["tag1"], 1000),
+            pool.submit(up, "u1", ["tag2"], 1500),
+            pool.submit(up, "u2", ["tag1", "tag3"], 2000),
+        ]
+        ids = [f.result()["image_id"] for f in futures]
+
+    # All three records exist; verify them with a single batched read
+    resp = ddb_table.meta.client.batch_get_item(
+        RequestItems={ddb_table.name: {"Keys": [{"image_id": i} for i in ids]}}
+    )
+    stored = {i["image_id"]: i for i in resp["Responses"][ddb_table.name]}
+    assert set(stored) == set(ids)
+    assert [stored[i]["user_id"] for i in ids] == ["u1", "u1", "u2"]
+
+    # Without filters every shard is queried and merged in created_at order
+    items = storage.list_images()
+    assert [int(i["created_at"]) for i in items] == [1000, 1500, 2000]
+    assert not any("list_shard" in i for i in items)
 
     # By user
     items = storage.list_images(user_id="u1")
@@ -161,13 +156,281 @@ def test_storage_list_images_filters_success(aws_mock, monkeypatch):
     # Only the second u1 item has created_at >= 1500 in this sequence
     assert all(i["user_id"] == "u1" and int(i["created_at"]) >= 1500 for i in items)
 
-    # By tag (scan path)
+    # By tag (shard index path)
     items = storage.list_images(tag="tag1")
     assert len(items) == 2
     assert set(i["user_id"] for i in items) == {"u1", "u2"}
 
-    # By created_before (scan path)
+    # By created_before (shard index path)
     items = storage.list_images(created_before=1600)
     # Should include all items with created_at <= 1600 (at least one expected)
     assert len(items) >= 1
     assert all(int(i["created_at"]) <= 1600 for i in items)
+
+
+def test_storage_list_images_reversed_range_success(aws_mock, spy, png_bytes):
+    storage.put_image_bytes(
+        user_id="u1",
+        filename="pic.png",
+        content_type="image/png",
+        data_bytes=png_bytes,
+        clock=lambda: 1500,
+    )
+
+    # DynamoDB rejects BETWEEN with reversed bounds; no query may be sent
+    query = spy(storage.dynamodb_client_factory(), "query")
+    assert storage.list_images(created_after=2000, created_before=1000) == []
+    assert storage.list_images(user_id="u1", created_after=2000, created_before=1000) == []
+    assert query.calls == []
+
+    # Equal bounds are a valid single-instant range
+    items = storage.list_images(created_after=1500, created_before=1500)
+    assert [int(i["created_at"]) for i in items] == [1500]
+
+
+def test_storage_list_images_paginates_success(aws_mock, spy, png_bytes):
+    for created_at in (1000, 1100, 1200):
+        storage.put_image_bytes(
+            user_id="u1",
+            filename="img.png",
+            content_type="image/png",
+            data_bytes=png_bytes,
+            clock=lambda: created_at,
+        )
+
+    # One item per page forces the ExclusiveStartKey prefetch loop
+    query = spy(storage.dynamodb_client_factory(), "query", before=lambda **kw: {**kw, "Limit": 1})
+
+    items = storage.list_images(user_id="u1")
+    assert [int(i["created_at"]) for i in items] == [1000, 1100, 1200]
+    # First page on the caller's thread, the rest prefetched by the pool
+    first, *rest = query.calls
+    assert "ExclusiveStartKey" not in first.kwargs and first.thread is threading.current_thread()
+    assert len(rest) >= 2
+    assert all("ExclusiveStartKey" in c.kwargs and c.thread is not threading.current_thread() for c in rest)
+
+    items = storage.list_images()
+    assert [int(i["created_at"]) for i in items] == [1000, 1100, 1200]
+
+
+def test_storage_put_rolls_back_s3_object_on_dynamodb_failure(aws_mock, s3_client, monkeypatch, png_bytes):
+    # Point the record write at a table that does not exist
+    monkeypatch.setattr(settings, "table_name", "MissingTable")
+
+    with pytest.raises(Exception):
+        storage.put_image_bytes(
+            user_id="u1",
+            filename="pic.png",
+            content_type="image/png",
+            data_bytes=png_bytes,
+        )
+
+    listing = s3_client.list_objects_v2(Bucket=settings.bucket_name, Prefix="u1/")
+    assert listing.get("KeyCount", 0) == 0
+
+
+def test_storage_put_uploads_on_calling_thread_success(aws_mock, spy, png_bytes):
+    # The shared I/O pool also serves listing queries, so the (possibly long)
+    # S3 transfer must not occupy one of its workers
+    upload = spy(storage.s3_client_factory(), "upload_fileobj")
+
+    storage.put_image_bytes(
+        user_id="u1", filename="pic.png", content_type="image/png", data_bytes=png_bytes
+    )
+
+    assert [c.thread for c in upload.calls] == [threading.current_thread()]
+
+
+def test_storage_put_presign_error_rolls_back_failure(aws_mock, s3_client, spy, png_bytes):
+    def signing_failed(*args, **kwargs):
+        raise RuntimeError("signing failed")
+
+    spy(storage, "_presign_get_object", before=signing_failed)
+    with pytest.raises(RuntimeError):
+        storage.put_image_bytes(
+            user_id="u1", filename="pic.png", content_type="image/png", data_bytes=png_bytes
+        )
+
+    # Neither the record (already submitted) nor the object is left behind
+    assert storage.list_images(user_id="u1") == []
+    listing = s3_client.list_objects_v2(Bucket=settings.bucket_name, Prefix="u1/")
+    assert listing.get("KeyCount", 0) == 0
+
+
+def test_storage_get_image_stream_missing_object_failure(aws_mock, ddb_table, s3_client, png_bytes):
+    # A record whose object isn't (yet) in S3, as during an in-flight upload
+    image_id = storage.put_image_bytes(
+        user_id="u1", filename="pic.png", content_type="image/png", data_bytes=png_bytes
+    )["image_id"]
+    item = ddb_table.get_item(Key={"image_id": image_id})["Item"]
+    s3_client.delete_object(Bucket=item["bucket_name"], Key=item["object_key"])
+
+    with pytest.raises(KeyError):
+        storage.get_image_stream(image_id)
+
+
+def test_storage_extract_image_metadata_exif_success():
+    exif = Image.Exif()
+    exif[0x010F] = "Canon"  # Make (base IFD)
+    exif[ExifTags.IFD.Exif] = {0x9003: "2020:01:01 00:00:00", 0xA002: 2}  # Exif sub-IFD
+    buf = BytesIO()
+    Image.new("RGB", (2, 2)).save(buf, format="JPEG", exif=exif.tobytes())
+
+    meta, fmt = storage._extract_image_metadata(buf.getvalue())
+
+    assert fmt == "JPEG"
+    assert meta["exif"] == {
+        "Make": "Canon",
+        "DateTimeOriginal": "2020:01:01 00:00:00",
+        "PixelXDimension": 2,
+    }
+
+
+def test_storage_extract_image_metadata_does_not_decode_pixels_success(spy):
+    image_open = spy(Image, "open")
+
+    for fmt in ("PNG", "JPEG"):
+        buf = BytesIO()
+        Image.new("RGB", (64, 64)).save(buf, format=fmt)
+        meta, got = storage._extract_image_metadata(buf.getvalue())
+        assert got == fmt and meta["width"] == 64
+
+    # Header-only: the core image (pixel buffer) was never allocated
+    assert [c.result.im for c in image_open.calls] == [None, None]
+
+
+def test_storage_finalize_image_reads_header_metadata_success(aws_mock, ddb_table, s3_client, png_bytes):
+    content = png_bytes
+    s3_client.put_object(
+        Bucket=settings.bucket_name,
+        Key="u1/abc123/direct.png",
+        Body=content,
+        ContentType="image/png",
+    )
+
+    resp = storage.finalize_image(user_id="u1", image_id="abc123", filename="direct.png", tags=["x"])
+    assert resp == {"image_id": "abc123"}
+
+    item = ddb_table.get_item(Key={"image_id": "abc123"}).get("Item")
+    assert item["size"] == len(content)
+    assert item["content_type"] == "image/png"
+    assert item["auto_metadata"]["width"] == 2
+
+    with pytest.raises(KeyError):
+        storage.finalize_image(user_id="u1", image_id="missing", filename="nope.png")
+
+
+def test_storage_finalize_image_large_png_reads_one_prefix_success(aws_mock, ddb_table, s3_client, spy):
+    # Incompressible pixels push the PNG well past the first 64 KiB range
+    buf = BytesIO()
+    Image.frombytes("L", (512, 512), os.urandom(512 * 512)).save(buf, format="PNG")
+    content = buf.getvalue()
+    assert len(content) > 64 * 1024
+    s3_client.put_object(Bucket=settings.bucket_name, Key="u1/big1/big.png", Body=content)
+
+    get_object = spy(storage.s3_client_factory(), "get_object")
+    image_open = spy(Image, "open")
+
+    storage.finalize_image(user_id="u1", image_id="big1", filename="big.png")
+
+    item = ddb_table.get_item(Key={"image_id": "big1"}).get("Item")
+    assert item["auto_metadata"]["width"] == 512
+    assert [c.kwargs.get("Range") for c in get_object.calls] == ["bytes=0-65535"]
+    # The truncated prefix is parsed from the header alone, never decoded
+    assert [c.result.im for c in image_open.calls] == [None]
+
+
+def test_storage_put_rejects_oversized_and_non_image_failure(aws_mock, monkeypatch, png_bytes):
+    content = png_bytes
+
+    monkeypatch.setattr(settings, "max_upload_bytes", len(content) - 1)
+    with pytest.raises(ValueError, match="file_too_large"):
+        storage.put_image_bytes(
+            user_id="u1", filename="pic.png", content_type="image/png", data_bytes=content
+        )
+
+    monkeypatch.setattr(settings, "max_upload_bytes", 1024)
+    with pytest.raises(ValueError, match="unsupported_image_type"):
+        storage.put_image_bytes(
+            user_id="u1", filename="pic.png", content_type="image/png", data_bytes=b"GIF89a" + content
+        )
+
+    # The pixel limit is read per call, like the byte limit
+    monkeypatch.setattr(settings, "max_image_pixels", 3)
+    with pytest.raises(ValueError, match="unsupported_image_type"):
+        storage.put_image_bytes(
+            user_id="u1", filename="pic.png", content_type="image/png", data_bytes=content
+        )
+
+
+def test_storage_presigned_get_is_cached_until_delete_success(aws_mock, monkeypatch, png_bytes):
+    monkeypatch.setattr(settings, "url_expiry", 900)
+    image_id = storage.put_image_bytes(
+        user_id="u1", filename="pic.png", content_type="image/png", data_bytes=png_bytes
+    )["image_id"]
+
+    first = storage.presigned_get(image_id=image_id, download=True)
+    assert storage.presigned_get(image_id=image_id, download=True) is first
+    assert storage.presigned_get(image_id=image_id, download=False) is not first
+
+    # Deleting the image must not leave a cached URL behind
+    storage.delete_image(image_id)
+    with pytest.raises(KeyError):
+        storage.presigned_get(image_id=image_id, download=True)
+
+
+def test_storage_presigned_get_cache_follows_finalize_overwrite_success(aws_mock, s3_client, monkeypatch):
+    monkeypatch.setattr(settings, "url_expiry", 900)
+    for name in ("a.png", "b.png"):
+        s3_client.put_object(Bucket=settings.bucket_name, Key=f"u1/img1/{name}", Body=b"x")
+
+    storage.finalize_image(user_id="u1", image_id="img1", filename="a.png")
+    assert "/u1/img1/a.png" in storage.presigned_get(image_id="img1")["url"]
+
+    # Re-finalizing under a new filename moves the record to a new object key
+    storage.finalize_image(user_id="u1", image_id="img1", filename="b.png")
+    assert "/u1/img1/b.png" in storage.presigned_get(image_id="img1")["url"]
+
+
+def test_storage_delete_image_restores_record_on_s3_failure(aws_mock, ddb_table, s3_client, monkeypatch, spy, png_bytes):
+    monkeypatch.setattr(settings, "url_expiry", 900)
+    image_id = storage.put_image_bytes(
+        user_id="u1", filename="pic.png", content_type="image/png", data_bytes=png_bytes
+    )["image_id"]
+    storage.presigned_get(image_id=image_id)
+
+    def s3_unavailable(**kwargs):
+        raise RuntimeError("s3 unavailable")
+
+    delete_object = spy(storage.s3_client_factory(), "delete_object", before=s3_unavailable)
+    with pytest.raises(RuntimeError):
+        storage.delete_image(image_id)
+
+    # The record is back and no cached URL survived the failed delete
+    item = ddb_table.get_item(Key={"image_id": image_id}).get("Item")
+    assert item is not None
+    assert (image_id, False) not in storage._presign_cache
+
+    # A retry succeeds once S3 is reachable again
+    delete_object.before = None
+    storage.delete_image(image_id)
+    assert ddb_table.get_item(Key={"image_id": image_id}).get("Item") is None
+    listing = s3_client.list_objects_v2(Bucket=item["bucket_name"], Prefix=item["object_key"])
+    assert listing.get("KeyCount", 0) == 0
+
+
+def test_storage_presigned_get_skips_caching_raced_miss_success(aws_mock, monkeypatch, spy, png_bytes):
+    monkeypatch.setattr(settings, "url_expiry", 900)
+    image_id = storage.put_image_bytes(
+        user_id="u1", filename="pic.png", content_type="image/png", data_bytes=png_bytes
+    )["image_id"]
+
+    # A delete/finalize lands between the miss's record read and its insert
+    presign = spy(storage, "_presign_get_object", before=lambda *a, **kw: storage._forget_presigned(image_id))
+    storage.presigned_get(image_id=image_id)
+    assert (image_id, False) not in storage._presign_cache
+
+    # Later misses cache again
+    presign.before = None
+    first = storage.presigned_get(image_id=image_id)
+    assert storage.presigned_get(image_id=image_id) is first